@@ -0,0 +1,180 @@
+"""Mide las operaciones principales del sistema sobre bases de datos sintéticas.
+
+Uso:
+    python benchmarks/ejecutar.py --tamanos 10k 100k --salida resultados.json
+
+Los resultados se emiten en JSON para poder compararlos entre commits.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DIRECTORIO, ".."))
+
+from facturacion import AlmacenPDF, Analitica, Config, Database, Factura, GeneradorPDF, ItemFactura
+from generar_datos import TAMANOS, VERSION_DATOS, generar
+
+OPERACIONES = ["obtener_facturas", "agregar_factura", "generar_pdf", "pdf_archivado", "ventas_por_dia",
+               "impresion_lote", "analitica", "reporte_ventas"]
+FACTURAS_POR_LOTE = 50
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        "repeticiones": repeticiones,
+        "min_s": min(tiempos),
+        "mediana_s": statistics.median(tiempos),
+        "media_s": statistics.fmean(tiempos),
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=DIRECTORIO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def preparar_base(tamano, directorio_datos, semilla):
+    db_path = os.path.join(directorio_datos, f"facturacion_bench_{tamano}_{semilla}_v{VERSION_DATOS}.db")
+    if not os.path.exists(db_path):
+        generar(db_path, TAMANOS[tamano], semilla)
+    return db_path
+
+
+def ejecutar_tamano(db_path, operaciones, repeticiones, directorio_trabajo):
+    # Se trabaja sobre una copia para que agregar_factura no altere la base generada.
+    copia = os.path.join(directorio_trabajo, "facturacion.db")
+    shutil.copyfile(db_path, copia)
+    db = Database(copia)
+    generador = GeneradorPDF(Config())
+    resultados = {}
+
+    if "analitica" in operaciones:
+        # Bases generadas con versiones anteriores pueden traer los resúmenes vacíos; se reconstruyen
+        # antes de agregar facturas para que la analítica no quede incompleta.
+        inicio = time.perf_counter()
+        db.reconstruir_resumenes()
+        resultados["analitica_reconstruir_s"] = time.perf_counter() - inicio
+
+    facturas = db.obtener_facturas()
+    if "obtener_facturas" in operaciones:
+        resultados["obtener_facturas"] = medir(db.obtener_facturas, repeticiones)
+
+    if "agregar_factura" in operaciones:
+        cliente = facturas[-1].cliente
+        productos = db.obtener_productos()[:5]
+
+        def agregar():
+            items = [ItemFactura(p, 1) for p in productos]
+            subtotal = sum(item.total for item in items)
+            iva = subtotal * Decimal('0.16')
+            db.agregar_factura(Factura(None, cliente, items, subtotal, iva, subtotal + iva))
+
+        resultados["agregar_factura"] = medir(agregar, repeticiones * 20)
+
+    if "generar_pdf" in operaciones:
+        factura = max(facturas[-100:], key=lambda f: len(f.items))
+        pdf_path = os.path.join(directorio_trabajo, "factura.pdf")
+        resultados["generar_pdf"] = medir(lambda: generador.generar_factura(factura, pdf_path), repeticiones * 5)
+
+    if "pdf_archivado" in operaciones:
+        # Reimpresiones repetidas de las últimas facturas, como ocurre al reenviar por correo.
+        almacen = AlmacenPDF(generador, directorio=os.path.join(directorio_trabajo, "pdf_cache"))
+        recientes = facturas[-20:]
+        resultados["pdf_archivado"] = medir(lambda: [almacen.obtener(f) for f in recientes], repeticiones * 5)
+        resultados["pdf_archivado"]["tasa_aciertos"] = almacen.tasa_aciertos()
+
+    if "impresion_lote" in operaciones:
+        lote = facturas[-FACTURAS_POR_LOTE:]
+        paginas = {}
+
+        def por_separado():
+            paginas["por_separado"] = sum(
+                generador.generar_factura(f, os.path.join(directorio_trabajo, f"factura_{f.numero}.pdf")) for f in lote
+            )
+
+        def en_un_archivo():
+            paginas["en_un_archivo"] = generador.generar_facturas(lote, os.path.join(directorio_trabajo, "lote.pdf"))
+
+        for nombre, funcion in (("por_separado", por_separado), ("en_un_archivo", en_un_archivo)):
+            medicion = medir(funcion, repeticiones)
+            medicion["facturas"] = len(lote)
+            medicion["paginas"] = paginas[nombre]
+            medicion["paginas_por_s"] = paginas[nombre] / medicion["mediana_s"]
+            resultados[f"impresion_lote_{nombre}"] = medicion
+
+    if "ventas_por_dia" in operaciones:
+        resultados["ventas_por_dia"] = medir(db.ventas_por_dia, repeticiones)
+
+    if "analitica" in operaciones:
+        resultados["analitica"] = medir(lambda: Analitica(db).resumen(), repeticiones)
+
+    if "reporte_ventas" in operaciones:
+        reporte_path = os.path.join(directorio_trabajo, "reporte.pdf")
+        resultados["reporte_ventas"] = medir(lambda: generador.generar_reporte(facturas, reporte_path), repeticiones)
+
+    db.cerrar()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del sistema de facturación.")
+    parser.add_argument("--tamanos", nargs="+", default=["10k"], choices=list(TAMANOS))
+    parser.add_argument("--operaciones", nargs="+", default=OPERACIONES, choices=OPERACIONES)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--datos", default=os.path.join(DIRECTORIO, "datos"),
+                        help="Directorio donde se guardan las bases generadas")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, salida estándar)")
+    args = parser.parse_args()
+
+    os.makedirs(args.datos, exist_ok=True)
+    datos = os.path.abspath(args.datos)
+    resultado = {
+        "commit": commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "semilla": args.semilla,
+        "resultados": {},
+    }
+
+    directorio_original = os.getcwd()
+    for tamano in args.tamanos:
+        db_path = preparar_base(tamano, datos, args.semilla)
+        with tempfile.TemporaryDirectory() as directorio_trabajo:
+            # Config escribe config.ini en el directorio actual.
+            os.chdir(directorio_trabajo)
+            try:
+                resultado["resultados"][tamano] = ejecutar_tamano(db_path, args.operaciones, args.repeticiones,
+                                                                  directorio_trabajo)
+            finally:
+                os.chdir(directorio_original)
+
+    salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(salida + "\n")
+    else:
+        print(salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Prueba de estrés del inventario con varias terminales escribiendo a la vez.
+
+Cada proceso simula una terminal que reserva stock y confirma facturas contra
+la misma base de datos hasta agotar los productos. Al final se comprueba que no
+hubo sobreventa y se reporta el rendimiento en JSON.
+
+Uso:
+    python benchmarks/estres_inventario.py --procesos 8 --productos 5 --stock 200
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from facturacion import Cliente, Database, Factura, ItemFactura, Producto, StockInsuficienteError
+
+
+def preparar(db_path, num_productos, stock):
+    db = Database(db_path)
+    db.agregar_cliente(Cliente(None, "Cliente Estrés", "Calle 1", "5500000000", "estres@ejemplo.com", "XAXX010101000"))
+    for i in range(num_productos):
+        db.agregar_producto(Producto(None, f"Producto {i}", "Producto de prueba", Decimal("10.00"), stock))
+    db.cerrar()
+
+
+def terminal(db_path, num_productos, semilla, reservar, resultados):
+    rng = random.Random(semilla)
+    db = Database(db_path)
+    sesion = uuid.uuid4().hex
+    cliente = db.obtener_clientes()[0]
+    productos = [db.obtener_producto(i) for i in range(1, num_productos + 1)]
+    agotados = set()
+    facturas = rechazos = 0
+    latencias = []
+
+    while len(agotados) < num_productos:
+        disponibles = [p for p in productos if p.id not in agotados]
+        items = []
+        for producto in rng.sample(disponibles, min(len(disponibles), rng.randint(1, 3))):
+            cantidad = rng.randint(1, 4)
+            if reservar:
+                reserva_id = db.reservar_stock(producto.id, cantidad, sesion)
+                if reserva_id is None:
+                    rechazos += 1
+                    if db.stock_disponible(producto.id) == 0:
+                        agotados.add(producto.id)
+                    continue
+                items.append(ItemFactura(producto, cantidad, reserva_id))
+            else:
+                items.append(ItemFactura(producto, cantidad))
+        if not items:
+            continue
+
+        subtotal = sum(item.total for item in items)
+        iva = subtotal * Decimal('0.16')
+        inicio = time.perf_counter()
+        try:
+            db.agregar_factura(Factura(None, cliente, items, subtotal, iva, subtotal + iva))
+            facturas += 1
+        except StockInsuficienteError as e:
+            rechazos += 1
+            if e.disponible == 0:
+                agotados.add(e.producto_id)
+        latencias.append(time.perf_counter() - inicio)
+
+    db.liberar_reservas_sesion(sesion)
+    db.cerrar()
+    resultados.put({"facturas": facturas, "rechazos": rechazos, "latencias": latencias})
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de estrés del inventario multi-terminal.")
+    parser.add_argument("--procesos", type=int, default=8)
+    parser.add_argument("--productos", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=200)
+    parser.add_argument("--sin-reservas", action="store_true",
+                        help="Confirmar facturas sin reservar stock antes (solo descuento condicional)")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        db_path = os.path.join(directorio, "facturacion.db")
+        preparar(db_path, args.productos, args.stock)
+
+        resultados = multiprocessing.Queue()
+        procesos = [
+            multiprocessing.Process(target=terminal, args=(db_path, args.productos, args.semilla + i,
+                                                           not args.sin_reservas, resultados))
+            for i in range(args.procesos)
+        ]
+        inicio = time.perf_counter()
+        for proceso in procesos:
+            proceso.start()
+        por_terminal = [resultados.get() for _ in procesos]
+        for proceso in procesos:
+            proceso.join()
+        duracion = time.perf_counter() - inicio
+
+        db = Database(db_path)
+        db.cursor.execute("SELECT MIN(stock), SUM(stock) FROM productos")
+        stock_minimo, stock_final = db.cursor.fetchone()
+        db.cursor.execute("SELECT COALESCE(SUM(cantidad), 0) FROM items_factura")
+        vendido = db.cursor.fetchone()[0]
+        db.cursor.execute("SELECT COUNT(*) FROM reservas")
+        reservas_pendientes = db.cursor.fetchone()[0]
+        db.cerrar()
+
+    facturas = sum(t["facturas"] for t in por_terminal)
+    latencias = [l for t in por_terminal for l in t["latencias"]]
+    stock_inicial = args.productos * args.stock
+    resultado = {
+        "procesos": args.procesos,
+        "productos": args.productos,
+        "stock_inicial": stock_inicial,
+        "reservas": not args.sin_reservas,
+        "facturas": facturas,
+        "rechazos": sum(t["rechazos"] for t in por_terminal),
+        "unidades_vendidas": vendido,
+        "stock_final": stock_final,
+        "reservas_pendientes": reservas_pendientes,
+        "duracion_s": duracion,
+        "facturas_por_s": facturas / duracion if duracion else None,
+        "latencia_commit_p50_s": percentil(latencias, 0.5),
+        "latencia_commit_p99_s": percentil(latencias, 0.99),
+        "sin_sobreventa": stock_minimo >= 0 and vendido + stock_final == stock_inicial,
+    }
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if not resultado["sin_sobreventa"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
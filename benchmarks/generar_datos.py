@@ -0,0 +1,141 @@
+"""Genera bases de datos sintéticas de facturación para los benchmarks.
+
+Uso:
+    python benchmarks/generar_datos.py --facturas 100000 --salida bench_100k.db
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from facturacion import Database
+
+TAMANOS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+TAMANO_LOTE = 10_000
+# Se incluye en el nombre de las bases en caché para no reutilizar datos de un generador anterior.
+VERSION_DATOS = 2
+EXPONENTE_ZIPF = 1.0
+
+NOMBRES = ["Ana", "Luis", "María", "José", "Carmen", "Jorge", "Lucía", "Pedro", "Sofía", "Miguel"]
+APELLIDOS = ["García", "Hernández", "López", "Martínez", "González", "Pérez", "Rodríguez", "Sánchez"]
+CATEGORIAS = ["Papelería", "Electrónica", "Limpieza", "Abarrotes", "Ferretería", "Farmacia"]
+
+
+def rfc_aleatorio(rng):
+    letras = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(4))
+    fecha = f"{rng.randint(50, 99):02d}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+    homoclave = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") for _ in range(3))
+    return letras + fecha + homoclave
+
+
+def generar_clientes(rng, n):
+    for i in range(1, n + 1):
+        nombre = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        yield (i, nombre, f"Calle {rng.randint(1, 999)} #{rng.randint(1, 200)}",
+               f"55{rng.randint(10000000, 99999999)}", f"cliente{i}@ejemplo.com", rfc_aleatorio(rng))
+
+
+def generar_productos(rng, n):
+    # Precios log-normales en centavos: muchos artículos baratos y pocos caros.
+    for i in range(1, n + 1):
+        precio = max(100, int(rng.lognormvariate(7.8, 1.1)))
+        yield (i, f"{rng.choice(CATEGORIAS)} {i:05d}", f"Producto sintético {i}",
+               f"{precio // 100}.{precio % 100:02d}", 10**9)
+
+
+def pesos_zipf(n, exponente=EXPONENTE_ZIPF):
+    # Peso 1/rango^s sobre todos los ids: pocos concentran buena parte de las ventas, sin que uno las acapare.
+    return list(itertools.accumulate(1 / rango ** exponente for rango in range(1, n + 1)))
+
+
+def elegir(rng, ids, pesos):
+    return rng.choices(ids, cum_weights=pesos)[0]
+
+
+def generar(db_path, num_facturas, semilla=42, num_clientes=None, num_productos=None):
+    rng = random.Random(semilla)
+    num_clientes = num_clientes or max(50, num_facturas // 20)
+    num_productos = num_productos or max(20, min(5000, num_facturas // 50))
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db = Database(db_path)
+    cursor = db.conn.cursor()
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+
+    cursor.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?, ?)", generar_clientes(rng, num_clientes))
+    productos = list(generar_productos(rng, num_productos))
+    cursor.executemany("INSERT INTO productos VALUES (?, ?, ?, ?, ?)", productos)
+    precios = [int(p[3].replace(".", "")) for p in productos]
+
+    # Orden de los clientes/productos permutado para que los "populares" no sean siempre los primeros ids.
+    orden_clientes = list(range(1, num_clientes + 1))
+    orden_productos = list(range(1, num_productos + 1))
+    rng.shuffle(orden_clientes)
+    rng.shuffle(orden_productos)
+    pesos_clientes = pesos_zipf(num_clientes)
+    pesos_productos = pesos_zipf(num_productos)
+
+    inicio = datetime(2022, 1, 1, 9, 0, 0)
+    segundos_totales = int(timedelta(days=3 * 365).total_seconds())
+    paso = segundos_totales / num_facturas
+
+    numero = 0
+    item_id = 0
+    while numero < num_facturas:
+        facturas = []
+        items = []
+        for _ in range(min(TAMANO_LOTE, num_facturas - numero)):
+            numero += 1
+            fecha = inicio + timedelta(seconds=int(numero * paso + rng.uniform(0, paso)))
+            cliente_id = elegir(rng, orden_clientes, pesos_clientes)
+            subtotal = 0
+            vistos = set()
+            for _ in range(min(10, 1 + int(rng.expovariate(0.45)))):
+                producto_id = elegir(rng, orden_productos, pesos_productos)
+                if producto_id in vistos:
+                    continue
+                vistos.add(producto_id)
+                cantidad = 1 + int(rng.expovariate(0.6))
+                precio = precios[producto_id - 1]
+                total = precio * cantidad
+                subtotal += total
+                item_id += 1
+                items.append((item_id, numero, producto_id, cantidad,
+                              f"{precio // 100}.{precio % 100:02d}", f"{total // 100}.{total % 100:02d}"))
+            iva = subtotal * 16 / 100
+            facturas.append((numero, cliente_id, f"{subtotal / 100:.2f}", f"{iva / 100:.4f}",
+                             f"{(subtotal + iva) / 100:.4f}", fecha.isoformat(sep=" "),
+                             str(uuid.UUID(int=rng.getrandbits(128), version=4))))
+        cursor.executemany("INSERT INTO facturas VALUES (?, ?, ?, ?, ?, ?, ?)", facturas)
+        cursor.executemany("INSERT INTO items_factura VALUES (?, ?, ?, ?, ?, ?)", items)
+        db.conn.commit()
+
+    # Las filas se insertaron por fuera de agregar_factura; los resúmenes se llenan al final.
+    db.reconstruir_resumenes()
+    db.cerrar()
+    return {"facturas": num_facturas, "items": item_id, "clientes": num_clientes, "productos": num_productos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una base de datos sintética de facturación.")
+    parser.add_argument("--facturas", default="10k", help="Número de facturas o uno de: " + ", ".join(TAMANOS))
+    parser.add_argument("--salida", help="Ruta del archivo .db a generar")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    num_facturas = TAMANOS.get(args.facturas.lower()) or int(args.facturas)
+    salida = args.salida or f"facturacion_bench_{args.facturas.lower()}.db"
+    resumen = generar(salida, num_facturas, args.semilla)
+    print(f"{salida}: {resumen['facturas']} facturas, {resumen['items']} items, "
+          f"{resumen['clientes']} clientes, {resumen['productos']} productos")
+
+
+if __name__ == "__main__":
+    main()
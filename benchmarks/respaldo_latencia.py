@@ -0,0 +1,113 @@
+"""Mide el impacto de un respaldo en línea sobre la latencia de confirmación de facturas.
+
+Un proceso confirma facturas sin pausa mientras el proceso principal ejecuta
+respaldos con distintos tamaños de paso. Se comparan las latencias sin respaldo
+y durante cada respaldo.
+
+Uso:
+    python benchmarks/respaldo_latencia.py --facturas 100k --pasos -1 1024 128
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DIRECTORIO, ".."))
+
+from facturacion import Database, Factura, ItemFactura, Respaldo
+from generar_datos import TAMANOS, VERSION_DATOS, generar
+
+
+def escritor(db_path, detener, resultados):
+    db = Database(db_path)
+    cliente = db.obtener_clientes()[0]
+    productos = db.obtener_productos()[:3]
+    latencias = []
+    while not detener.is_set():
+        items = [ItemFactura(p, 1) for p in productos]
+        subtotal = sum(item.total for item in items)
+        iva = subtotal * Decimal('0.16')
+        inicio = time.time()
+        db.agregar_factura(Factura(None, cliente, items, subtotal, iva, subtotal + iva))
+        latencias.append((inicio, time.time() - inicio))
+    db.cerrar()
+    resultados.put(latencias)
+
+
+def estadisticas(latencias):
+    if not latencias:
+        return {"confirmaciones": 0}
+    ordenadas = sorted(latencias)
+    return {
+        "confirmaciones": len(ordenadas),
+        "p50_ms": statistics.median(ordenadas) * 1000,
+        "p99_ms": ordenadas[min(len(ordenadas) - 1, int(0.99 * len(ordenadas)))] * 1000,
+        "max_ms": ordenadas[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Impacto del respaldo en línea en la latencia de las ventas.")
+    parser.add_argument("--facturas", default="100k", choices=list(TAMANOS))
+    parser.add_argument("--pasos", nargs="+", type=int, default=[-1, 1024, 128],
+                        help="Páginas por paso del respaldo (-1 copia todo en un solo paso)")
+    parser.add_argument("--comprimir", action="store_true")
+    parser.add_argument("--referencia", type=float, default=3.0, help="Segundos medidos sin respaldo")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--datos", default=os.path.join(DIRECTORIO, "datos"))
+    args = parser.parse_args()
+
+    os.makedirs(args.datos, exist_ok=True)
+    generada = os.path.join(args.datos, f"facturacion_bench_{args.facturas}_{args.semilla}_v{VERSION_DATOS}.db")
+    if not os.path.exists(generada):
+        generar(generada, TAMANOS[args.facturas], args.semilla)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        db_path = os.path.join(directorio, "facturacion.db")
+        shutil.copyfile(generada, db_path)
+        # Crea índices y tablas nuevas antes de medir, para que no caigan dentro de ninguna ventana.
+        Database(db_path).cerrar()
+
+        detener = multiprocessing.Event()
+        resultados = multiprocessing.Queue()
+        proceso = multiprocessing.Process(target=escritor, args=(db_path, detener, resultados))
+        proceso.start()
+
+        time.sleep(0.5)
+        ventanas = [("sin_respaldo", time.time(), None)]
+        time.sleep(args.referencia)
+        ventanas[0] = ("sin_respaldo", ventanas[0][1], time.time())
+
+        respaldos = {}
+        for paginas in args.pasos:
+            respaldo = Respaldo(db_path, os.path.join(directorio, "respaldos"), paginas_por_paso=paginas,
+                                comprimir=args.comprimir, conservar=1)
+            inicio = time.time()
+            ruta = respaldo.crear()
+            fin = time.time()
+            ventanas.append((f"paso_{paginas}", inicio, fin))
+            respaldos[f"paso_{paginas}"] = {"duracion_s": fin - inicio, "bytes": os.path.getsize(ruta),
+                                            "verificado": respaldo.verificar(ruta)["valido"]}
+            time.sleep(0.5)
+
+        detener.set()
+        latencias = resultados.get()
+        proceso.join()
+
+    resultado = {"facturas": args.facturas, "comprimir": args.comprimir, "ventanas": {}}
+    for nombre, inicio, fin in ventanas:
+        medicion = estadisticas([l for t, l in latencias if inicio <= t < fin])
+        medicion.update(respaldos.get(nombre, {}))
+        resultado["ventanas"][nombre] = medicion
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
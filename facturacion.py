@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import ttkthemes
 import sqlite3
 import smtplib
@@ -8,17 +8,17 @@ from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, landscape, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.charts.barcharts import VerticalBarChart
 import os
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import uuid
 import re
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 from decimal import Decimal
@@ -26,7 +26,34 @@ import qrcode
 from PIL import Image as PILImage
 import io
 import configparser
+import csv
+import gzip
+import shutil
+import tempfile
+import threading
 import atexit
+import sys
+import argparse
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+sqlite3.register_adapter(Decimal, str)
+
+RESERVA_TTL_SEGUNDOS = 15 * 60
+
+# RFC genéricos del SAT (público en general y extranjeros): se comparten entre clientes.
+RFC_GENERICOS = ("XAXX010101000", "XEXX010101000")
+CONDICION_RFC_UNICO = "rfc IS NOT NULL AND rfc <> '' AND rfc NOT IN ('XAXX010101000', 'XEXX010101000')"
+
+class StockInsuficienteError(Exception):
+    def __init__(self, producto_id, disponible=None):
+        self.producto_id = producto_id
+        self.disponible = disponible
+        super().__init__(f"Stock insuficiente para el producto {producto_id}")
+
+def normalizar_rfc(rfc):
+    return rfc.strip().upper() if rfc else rfc
 
 class Config:
     def __init__(self):
@@ -45,7 +72,17 @@ class Config:
                 'password': ''
             }
             self.config['PDF'] = {
-                'page_size': 'letter'  # Options: letter, A4
+                'page_size': 'letter',  # Options: letter, A4
+                'cache_dir': 'pdf_cache',
+                'cache_max_mb': '200',
+                'cache_memoria': '32'
+            }
+            self.config['Respaldo'] = {
+                'intervalo_minutos': '60',  # 0 desactiva los respaldos automáticos
+                'directorio': 'respaldos',
+                'comprimir': 'yes',
+                'conservar': '7',  # Mínimo 1
+                'paginas_por_paso': '1024'
             }
             self.save_config()
 
@@ -59,6 +96,11 @@ class Config:
     def get_pdf_settings(self):
         return dict(self.config['PDF'])
 
+    def get_respaldo_settings(self):
+        if not self.config.has_section('Respaldo'):
+            return {}
+        return dict(self.config['Respaldo'])
+
 class Cliente:
     def __init__(self, id, nombre, direccion, telefono, email, rfc):
         self.id = id
@@ -96,7 +138,7 @@ class Producto:
         }
 
 class Factura:
-    def __init__(self, numero, cliente, items, subtotal, iva, total, fecha=None):
+    def __init__(self, numero, cliente, items, subtotal, iva, total, fecha=None, uuid_factura=None):
         self.numero = numero
         self.cliente = cliente
         self.items = items
@@ -104,7 +146,7 @@ class Factura:
         self.iva = iva
         self.total = total
         self.fecha = fecha or datetime.now()
-        self.uuid = str(uuid.uuid4())
+        self.uuid = uuid_factura or str(uuid.uuid4())
 
     def to_dict(self):
         return {
@@ -119,9 +161,10 @@ class Factura:
         }
 
 class ItemFactura:
-    def __init__(self, producto, cantidad):
+    def __init__(self, producto, cantidad, reserva_id=None):
         self.producto = producto
         self.cantidad = cantidad
+        self.reserva_id = reserva_id
         self.total = Decimal(str(producto.precio)) * Decimal(str(cantidad))
 
     def to_dict(self):
@@ -132,15 +175,25 @@ class ItemFactura:
         }
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect("facturacion.db")
+    def __init__(self, db_path="facturacion.db"):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30)
         self.cursor = self.conn.cursor()
+        self.conn.create_function("normalizar_rfc", 1, normalizar_rfc, deterministic=True)
+        # WAL permite que varias terminales lean mientras otra confirma una venta.
+        self.cursor.execute("PRAGMA journal_mode = WAL")
         self.crear_tablas()
         atexit.register(self.cleanup)
 
     def cleanup(self):
+        self.cerrar()
+
+    def cerrar(self):
+        # Puede llamarse varias veces; tras cerrar ya no hace falta el cierre al salir.
         if self.conn:
             self.conn.close()
+            self.conn = None
+        atexit.unregister(self.cleanup)
 
     def crear_tablas(self):
         self.cursor.execute('''
@@ -186,15 +239,136 @@ class Database:
                 FOREIGN KEY (producto_id) REFERENCES productos (id)
             )
         ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reservas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                producto_id INTEGER NOT NULL,
+                cantidad INTEGER NOT NULL,
+                sesion TEXT NOT NULL,
+                expira REAL NOT NULL,
+                FOREIGN KEY (producto_id) REFERENCES productos (id)
+            )
+        ''')
+        self.cursor.execute("SELECT name FROM pragma_table_info('resumen_clientes_mes')")
+        columnas_resumen = {fila[0] for fila in self.cursor.fetchall()}
+        if "ventas" in columnas_resumen:
+            # Versiones anteriores sumaban por cliente el total con IVA y por producto sin IVA.
+            self.cursor.execute("DROP TABLE resumen_clientes_mes")
+            self.cursor.execute("DROP TABLE IF EXISTS resumen_productos_mes")
+        resumenes_nuevos = "subtotal" not in columnas_resumen
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_clientes_mes (
+                mes TEXT NOT NULL,
+                cliente_id INTEGER NOT NULL,
+                facturas INTEGER NOT NULL,
+                subtotal REAL NOT NULL,
+                ultima DATETIME NOT NULL,
+                PRIMARY KEY (mes, cliente_id)
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_productos_mes (
+                mes TEXT NOT NULL,
+                producto_id INTEGER NOT NULL,
+                unidades INTEGER NOT NULL,
+                subtotal REAL NOT NULL,
+                PRIMARY KEY (mes, producto_id)
+            )
+        ''')
+        # Cada factura carga sus items por número; sin índice cada carga recorre toda la tabla.
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_items_factura_numero ON items_factura (factura_numero)")
+        self.conn.commit()
+        self.crear_indices_unicos()
+        # Al actualizar una base anterior a los resúmenes se llenan una sola vez; si se esperara a la
+        # primera consulta, una venta registrada antes dejaría los resúmenes incompletos.
+        if resumenes_nuevos:
+            self.reconstruir_resumenes()
+
+    def crear_indices_unicos(self):
+        # En bases con duplicados previos el índice no puede crearse; `verificar` los reporta.
+        indices = {
+            "idx_facturas_uuid": "CREATE UNIQUE INDEX IF NOT EXISTS idx_facturas_uuid ON facturas (uuid)",
+            "idx_clientes_rfc": f"CREATE UNIQUE INDEX IF NOT EXISTS idx_clientes_rfc ON clientes (rfc) WHERE {CONDICION_RFC_UNICO}",
+        }
+        self.indices_faltantes = []
+        # RFC guardados antes de normalizarlos al escribir: sin esto "aaa010101aaa " y "AAA010101AAA"
+        # serían distintos para el índice. Se quita el índice mientras tanto por si al normalizar chocan.
+        self.cursor.execute("SELECT EXISTS (SELECT 1 FROM clientes WHERE rfc <> normalizar_rfc(rfc))")
+        if self.cursor.fetchone()[0]:
+            self.cursor.execute("DROP INDEX IF EXISTS idx_clientes_rfc")
+            self.cursor.execute("UPDATE clientes SET rfc = normalizar_rfc(rfc) WHERE rfc <> normalizar_rfc(rfc)")
+        for nombre, sql in indices.items():
+            try:
+                self.cursor.execute(sql)
+            except sqlite3.IntegrityError:
+                self.indices_faltantes.append(nombre)
         self.conn.commit()
 
     def agregar_cliente(self, cliente):
-        self.cursor.execute('''
+        try:
+            self.cursor.execute('''
+                INSERT INTO clientes (nombre, direccion, telefono, email, rfc)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (cliente.nombre, cliente.direccion, cliente.telefono, cliente.email, normalizar_rfc(cliente.rfc)))
+            self.conn.commit()
+        except Exception:
+            # Un RFC duplicado deja abierta la transacción implícita y con ella el bloqueo de escritura.
+            self.conn.rollback()
+            raise
+        return self.cursor.lastrowid
+
+    def upsert_cliente(self, cliente):
+        rfc = normalizar_rfc(cliente.rfc)
+        if not rfc or rfc in RFC_GENERICOS:
+            # Sin RFC propio el cliente se identifica por nombre y correo, para que reimportar no lo duplique.
+            return self.actualizar_o_insertar_cliente(
+                "nombre = ? AND COALESCE(email, '') = ? AND COALESCE(rfc, '') = ?",
+                (cliente.nombre, cliente.email or "", rfc or ""), cliente, rfc
+            )
+        if "idx_clientes_rfc" in self.indices_faltantes:
+            # Con RFC duplicados no existe el índice que necesita ON CONFLICT; se actualiza el cliente más antiguo.
+            return self.actualizar_o_insertar_cliente("rfc = ?", (rfc,), cliente, rfc)
+        self.cursor.execute(f'''
             INSERT INTO clientes (nombre, direccion, telefono, email, rfc)
             VALUES (?, ?, ?, ?, ?)
-        ''', (cliente.nombre, cliente.direccion, cliente.telefono, cliente.email, cliente.rfc))
-        self.conn.commit()
-        return self.cursor.lastrowid
+            ON CONFLICT (rfc) WHERE {CONDICION_RFC_UNICO} DO UPDATE SET
+                nombre = excluded.nombre,
+                direccion = excluded.direccion,
+                telefono = excluded.telefono,
+                email = excluded.email
+            RETURNING id
+        ''', (cliente.nombre, cliente.direccion, cliente.telefono, cliente.email, rfc))
+        return self.cursor.fetchone()[0]
+
+    def actualizar_o_insertar_cliente(self, condicion, parametros, cliente, rfc):
+        self.cursor.execute(f"SELECT id FROM clientes WHERE {condicion} ORDER BY id LIMIT 1", parametros)
+        row = self.cursor.fetchone()
+        if row is None:
+            self.cursor.execute('''
+                INSERT INTO clientes (nombre, direccion, telefono, email, rfc)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (cliente.nombre, cliente.direccion, cliente.telefono, cliente.email, rfc))
+            return self.cursor.lastrowid
+        self.cursor.execute('''
+            UPDATE clientes SET nombre = ?, direccion = ?, telefono = ?, email = ?
+            WHERE id = ?
+        ''', (cliente.nombre, cliente.direccion, cliente.telefono, cliente.email, row[0]))
+        return row[0]
+
+    def importar_clientes(self, ruta_csv):
+        importados = 0
+        with open(ruta_csv, newline="", encoding="utf-8") as archivo:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for fila in csv.DictReader(archivo):
+                    self.upsert_cliente(Cliente(None, fila["nombre"], fila.get("direccion", ""),
+                                                fila.get("telefono", ""), fila.get("email", ""), fila.get("rfc", "")))
+                    importados += 1
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return importados
 
     def obtener_clientes(self):
         self.cursor.execute("SELECT * FROM clientes")
@@ -212,52 +386,962 @@ class Database:
         self.cursor.execute("SELECT * FROM productos")
         return [Producto(*row) for row in self.cursor.fetchall()]
 
+    def obtener_producto(self, producto_id):
+        self.cursor.execute("SELECT * FROM productos WHERE id = ?", (producto_id,))
+        row = self.cursor.fetchone()
+        return Producto(*row) if row else None
+
     def agregar_factura(self, factura):
-        self.cursor.execute('''
-            INSERT INTO facturas (cliente_id, subtotal, iva, total, fecha, uuid)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (factura.cliente.id, factura.subtotal, factura.iva, factura.total, factura.fecha, factura.uuid))
-        factura_numero = self.cursor.lastrowid
-        for item in factura.items:
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
             self.cursor.execute('''
-                INSERT INTO items_factura (factura_numero, producto_id, cantidad, precio_unitario, total)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (factura_numero, item.producto.id, item.cantidad, item.producto.precio, item.total))
-        self.conn.commit()
+                INSERT INTO facturas (cliente_id, subtotal, iva, total, fecha, uuid)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (factura.cliente.id, factura.subtotal, factura.iva, factura.total, factura.fecha, factura.uuid))
+            factura_numero = self.cursor.lastrowid
+            for item in factura.items:
+                self.cursor.execute('''
+                    INSERT INTO items_factura (factura_numero, producto_id, cantidad, precio_unitario, total)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (factura_numero, item.producto.id, item.cantidad, item.producto.precio, item.total))
+                self.consumir_stock(item)
+            self.acumular_resumenes(factura)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
         return factura_numero
 
-    def obtener_facturas(self):
+    def acumular_resumenes(self, factura):
+        mes = factura.fecha.strftime("%Y-%m")
         self.cursor.execute('''
+            INSERT INTO resumen_clientes_mes (mes, cliente_id, facturas, subtotal, ultima)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT (mes, cliente_id) DO UPDATE SET
+                facturas = facturas + 1,
+                subtotal = subtotal + excluded.subtotal,
+                ultima = MAX(ultima, excluded.ultima)
+        ''', (mes, factura.cliente.id, factura.subtotal, factura.fecha))
+        for item in factura.items:
+            self.cursor.execute('''
+                INSERT INTO resumen_productos_mes (mes, producto_id, unidades, subtotal)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (mes, producto_id) DO UPDATE SET
+                    unidades = unidades + excluded.unidades,
+                    subtotal = subtotal + excluded.subtotal
+            ''', (mes, item.producto.id, item.cantidad, item.total))
+
+    def reconstruir_resumenes(self):
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self.cursor.execute("DELETE FROM resumen_clientes_mes")
+            self.cursor.execute("DELETE FROM resumen_productos_mes")
+            self.acumular_resumenes_desde("main")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        # Las facturas archivadas siguen contando para la analítica histórica.
+        for anio in self.anios_archivados():
+            with self.adjuntar_archivo(anio) as esquema:
+                self.acumular_resumenes_desde(esquema)
+
+    def acumular_resumenes_desde(self, esquema):
+        # Una factura puede quedar en la base principal y en el archivo si el archivado se interrumpió.
+        condicion = "true" if esquema == "main" else "f.numero NOT IN (SELECT numero FROM main.facturas)"
+        self.cursor.execute(f'''
+            INSERT INTO resumen_clientes_mes (mes, cliente_id, facturas, subtotal, ultima)
+            SELECT substr(f.fecha, 1, 7), f.cliente_id, COUNT(*), SUM(f.subtotal), MAX(f.fecha)
+            FROM {esquema}.facturas f
+            WHERE {condicion}
+            GROUP BY 1, 2
+            ON CONFLICT (mes, cliente_id) DO UPDATE SET
+                facturas = facturas + excluded.facturas,
+                subtotal = subtotal + excluded.subtotal,
+                ultima = MAX(ultima, excluded.ultima)
+        ''')
+        self.cursor.execute(f'''
+            INSERT INTO resumen_productos_mes (mes, producto_id, unidades, subtotal)
+            SELECT substr(f.fecha, 1, 7), i.producto_id, SUM(i.cantidad), SUM(i.total)
+            FROM {esquema}.items_factura i
+            JOIN {esquema}.facturas f ON f.numero = i.factura_numero
+            WHERE {condicion}
+            GROUP BY 1, 2
+            ON CONFLICT (mes, producto_id) DO UPDATE SET
+                unidades = unidades + excluded.unidades,
+                subtotal = subtotal + excluded.subtotal
+        ''')
+
+    def resumenes_vacios(self):
+        self.cursor.execute("SELECT EXISTS (SELECT 1 FROM resumen_clientes_mes)")
+        if self.cursor.fetchone()[0]:
+            return False
+        self.cursor.execute("SELECT EXISTS (SELECT 1 FROM facturas)")
+        return bool(self.cursor.fetchone()[0]) or bool(self.anios_archivados())
+
+    def consumir_stock(self, item):
+        # El stock de un item reservado ya se descontó; si la reserva venció se descuenta de nuevo.
+        if item.reserva_id is not None:
+            self.cursor.execute(
+                "DELETE FROM reservas WHERE id = ? AND producto_id = ? AND cantidad = ?",
+                (item.reserva_id, item.producto.id, item.cantidad)
+            )
+            if self.cursor.rowcount == 1:
+                return
+        self.cursor.execute(
+            "UPDATE productos SET stock = stock - ? WHERE id = ? AND stock >= ?",
+            (item.cantidad, item.producto.id, item.cantidad)
+        )
+        if self.cursor.rowcount != 1:
+            raise StockInsuficienteError(item.producto.id, self.stock_disponible(item.producto.id))
+
+    def obtener_facturas(self, anio=None):
+        if anio is None:
+            return self.consultar_facturas("main")
+
+        inicio, fin = f"{anio:04d}-01-01", f"{anio + 1:04d}-01-01"
+        facturas = self.consultar_facturas("main", "WHERE f.fecha >= ? AND f.fecha < ?", (inicio, fin))
+        if anio in self.anios_archivados():
+            with self.adjuntar_archivo(anio) as esquema:
+                archivadas = self.consultar_facturas(esquema)
+            # Si el archivado se interrumpió entre copiar y borrar, la factura está en ambos lados.
+            numeros = {factura.numero for factura in archivadas}
+            facturas = archivadas + [factura for factura in facturas if factura.numero not in numeros]
+        return facturas
+
+    def consultar_facturas(self, esquema, condicion="", parametros=()):
+        self.cursor.execute(f'''
             SELECT f.numero, c.id, c.nombre, c.direccion, c.telefono, c.email, c.rfc,
                    f.subtotal, f.iva, f.total, f.fecha, f.uuid
-            FROM facturas f
-            JOIN clientes c ON f.cliente_id = c.id
-        ''')
-        facturas = []
-        for row in self.cursor.fetchall():
-            cliente = Cliente(row[1], row[2], row[3], row[4], row[5], row[6])
-            factura = Factura(row[0], cliente, [], Decimal(row[7]), Decimal(row[8]), Decimal(row[9]), datetime.fromisoformat(row[10]))
-            factura.uuid = row[11]
-            self.cursor.execute('''
-                SELECT p.id, p.nombre, p.descripcion, p.precio, p.stock, i.cantidad
-                FROM items_factura i
-                JOIN productos p ON i.producto_id = p.id
-                WHERE i.factura_numero = ?
-            ''', (factura.numero,))
-            for item_row in self.cursor.fetchall():
-                producto = Producto(item_row[0], item_row[1], item_row[2], Decimal(item_row[3]), item_row[4])
-                item = ItemFactura(producto, item_row[5])
-                factura.items.append(item)
-            facturas.append(factura)
+            FROM {esquema}.facturas f
+            JOIN main.clientes c ON f.cliente_id = c.id
+            {condicion}
+        ''', parametros)
+        facturas = [self.factura_desde_fila(row) for row in self.cursor.fetchall()]
+        for factura in facturas:
+            self.cargar_items(factura, esquema)
         return facturas
 
-    def actualizar_stock(self, producto_id, cantidad):
+    def obtener_facturas_por_numero(self, numeros):
+        numeros = list(numeros)
+        facturas = {}
+        for inicio in range(0, len(numeros), 500):
+            lote = numeros[inicio:inicio + 500]
+            marcadores = ", ".join("?" for _ in lote)
+            for factura in self.consultar_facturas("main", f"WHERE f.numero IN ({marcadores})", lote):
+                facturas[factura.numero] = factura
+        faltantes = [numero for numero in numeros if numero not in facturas]
+        for numero in faltantes:
+            factura = self.obtener_factura(numero)
+            if factura:
+                facturas[numero] = factura
+        return [facturas[numero] for numero in numeros if numero in facturas]
+
+    def obtener_facturas_entre(self, desde, hasta):
+        condicion = "WHERE f.fecha >= ? AND f.fecha < ? ORDER BY f.numero"
+        parametros = (desde.isoformat(), (hasta + timedelta(days=1)).isoformat())
+        facturas = []
+        for anio in self.anios_archivados():
+            if desde.year <= anio <= hasta.year:
+                with self.adjuntar_archivo(anio) as esquema:
+                    facturas += self.consultar_facturas(esquema, condicion, parametros)
+        numeros = {factura.numero for factura in facturas}
+        return facturas + [factura for factura in self.consultar_facturas("main", condicion, parametros)
+                           if factura.numero not in numeros]
+
+    def obtener_factura(self, numero):
+        facturas = self.consultar_facturas("main", "WHERE f.numero = ?", (numero,))
+        if facturas:
+            return facturas[0]
+        for anio in sorted(self.anios_archivados(), reverse=True):
+            with self.adjuntar_archivo(anio) as esquema:
+                facturas = self.consultar_facturas(esquema, "WHERE f.numero = ?", (numero,))
+            if facturas:
+                return facturas[0]
+        return None
+
+    def factura_desde_fila(self, row):
+        cliente = Cliente(row[1], row[2], row[3], row[4], row[5], row[6])
+        return Factura(row[0], cliente, [], Decimal(row[7]), Decimal(row[8]), Decimal(row[9]),
+                       datetime.fromisoformat(row[10]), row[11])
+
+    def cargar_items(self, factura, esquema="main"):
+        self.cursor.execute(f'''
+            SELECT p.id, p.nombre, p.descripcion, p.precio, p.stock, i.cantidad
+            FROM {esquema}.items_factura i
+            JOIN main.productos p ON i.producto_id = p.id
+            WHERE i.factura_numero = ?
+        ''', (factura.numero,))
+        for item_row in self.cursor.fetchall():
+            producto = Producto(item_row[0], item_row[1], item_row[2], Decimal(item_row[3]), item_row[4])
+            factura.items.append(ItemFactura(producto, item_row[5]))
+
+    def ventas_por_dia(self):
         self.cursor.execute('''
-            UPDATE productos
-            SET stock = stock - ?
-            WHERE id = ?
-        ''', (cantidad, producto_id))
-        self.conn.commit()
+            SELECT substr(fecha, 1, 10), SUM(total)
+            FROM facturas
+            GROUP BY substr(fecha, 1, 10)
+            ORDER BY 1
+        ''')
+        return {date.fromisoformat(dia): Decimal(str(total)) for dia, total in self.cursor.fetchall()}
+
+    def stock_disponible(self, producto_id):
+        self.cursor.execute("SELECT stock FROM productos WHERE id = ?", (producto_id,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def reservar_stock(self, producto_id, cantidad, sesion, ttl=RESERVA_TTL_SEGUNDOS):
+        ahora = time.time()
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self.devolver_reservas("expira < ?", (ahora,))
+            self.cursor.execute(
+                "UPDATE productos SET stock = stock - ? WHERE id = ? AND stock >= ?",
+                (cantidad, producto_id, cantidad)
+            )
+            if self.cursor.rowcount != 1:
+                self.conn.commit()
+                return None
+            self.cursor.execute(
+                "INSERT INTO reservas (producto_id, cantidad, sesion, expira) VALUES (?, ?, ?, ?)",
+                (producto_id, cantidad, sesion, ahora + ttl)
+            )
+            reserva_id = self.cursor.lastrowid
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return reserva_id
+
+    def liberar_reservas_sesion(self, sesion):
+        self.liberar_reservas_donde("sesion = ?", (sesion,))
+
+    def liberar_reservas_vencidas(self):
+        self.liberar_reservas_donde("expira < ?", (time.time(),))
+
+    def liberar_reservas_donde(self, condicion, parametros):
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self.devolver_reservas(condicion, parametros)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def devolver_reservas(self, condicion, parametros):
+        self.cursor.execute(f"SELECT producto_id, SUM(cantidad) FROM reservas WHERE {condicion} GROUP BY producto_id", parametros)
+        for producto_id, cantidad in self.cursor.fetchall():
+            self.cursor.execute("UPDATE productos SET stock = stock + ? WHERE id = ?", (cantidad, producto_id))
+        self.cursor.execute(f"DELETE FROM reservas WHERE {condicion}", parametros)
+
+    def ruta_archivo(self, anio):
+        base, extension = os.path.splitext(self.db_path)
+        return f"{base}_{anio:04d}{extension or '.db'}"
+
+    def anios_archivados(self):
+        directorio = os.path.dirname(os.path.abspath(self.db_path))
+        base, extension = os.path.splitext(os.path.basename(self.db_path))
+        patron = re.compile(rf"^{re.escape(base)}_(\d{{4}}){re.escape(extension or '.db')}$")
+        anios = []
+        for nombre in os.listdir(directorio):
+            coincidencia = patron.match(nombre)
+            if coincidencia:
+                anios.append(int(coincidencia.group(1)))
+        return sorted(anios)
+
+    @contextmanager
+    def adjuntar_archivo(self, anio):
+        esquema = f"archivo_{anio:04d}"
+        self.cursor.execute("ATTACH DATABASE ? AS " + esquema, (self.ruta_archivo(anio),))
+        try:
+            yield esquema
+        finally:
+            self.conn.commit()
+            self.cursor.execute("DETACH DATABASE " + esquema)
+
+    def crear_tablas_archivo(self, esquema):
+        self.cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {esquema}.facturas (
+                numero INTEGER PRIMARY KEY,
+                cliente_id INTEGER,
+                subtotal DECIMAL(10, 2) NOT NULL,
+                iva DECIMAL(10, 2) NOT NULL,
+                total DECIMAL(10, 2) NOT NULL,
+                fecha DATETIME NOT NULL,
+                uuid TEXT NOT NULL
+            )
+        ''')
+        self.cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {esquema}.items_factura (
+                id INTEGER PRIMARY KEY,
+                factura_numero INTEGER,
+                producto_id INTEGER,
+                cantidad INTEGER NOT NULL,
+                precio_unitario DECIMAL(10, 2) NOT NULL,
+                total DECIMAL(10, 2) NOT NULL
+            )
+        ''')
+        # Los archivos solo se leen una vez cerrados, así que los índices no penalizan escrituras.
+        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_items_factura_numero ON items_factura (factura_numero)")
+        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_facturas_fecha ON facturas (fecha)")
+
+    def archivar_anio(self, anio, compactar=True):
+        if anio >= datetime.now().year:
+            raise ValueError(f"Solo se pueden archivar años cerrados (año actual: {datetime.now().year}).")
+
+        inicio, fin = f"{anio:04d}-01-01", f"{anio + 1:04d}-01-01"
+        self.cursor.execute("SELECT COUNT(*) FROM facturas WHERE fecha >= ? AND fecha < ?", (inicio, fin))
+        if self.cursor.fetchone()[0] == 0:
+            return 0
+
+        # En modo WAL una transacción no es atómica entre la base principal y un archivo adjunto, así que
+        # primero se copia al archivo y se confirma, y después se borra de la principal. Si el proceso se
+        # interrumpe entre los dos pasos las facturas quedan duplicadas (las lecturas las descartan) y
+        # repetir el comando completa el archivado.
+        with self.adjuntar_archivo(anio) as esquema:
+            self.crear_tablas_archivo(esquema)
+            self.cursor.execute("BEGIN IMMEDIATE")
+            try:
+                self.cursor.execute(
+                    f"INSERT OR IGNORE INTO {esquema}.facturas SELECT * FROM facturas WHERE fecha >= ? AND fecha < ?",
+                    (inicio, fin)
+                )
+                self.cursor.execute(f'''
+                    INSERT OR IGNORE INTO {esquema}.items_factura
+                    SELECT i.* FROM items_factura i JOIN facturas f ON f.numero = i.factura_numero
+                    WHERE f.fecha >= ? AND f.fecha < ?
+                ''', (inicio, fin))
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+            archivadas_en_principal = f"""
+                SELECT numero FROM facturas
+                WHERE fecha >= ? AND fecha < ? AND numero IN (SELECT numero FROM {esquema}.facturas)
+            """
+            self.cursor.execute("BEGIN IMMEDIATE")
+            try:
+                self.cursor.execute(f"DELETE FROM items_factura WHERE factura_numero IN ({archivadas_en_principal})",
+                                    (inicio, fin))
+                self.cursor.execute(f"DELETE FROM facturas WHERE numero IN ({archivadas_en_principal})", (inicio, fin))
+                archivadas = self.cursor.rowcount
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+        if compactar:
+            self.cursor.execute("VACUUM")
+        return archivadas
+
+class GeneradorPDF:
+    ESTILO_TABLA = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('ALIGN', (0, -1), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, -1), (-1, -1), 10),
+        ('TOPPADDING', (0, -1), (-1, -1), 12),
+    ])
+
+    def __init__(self, config):
+        self.config = config
+        # Hoja de estilos compartida por todas las facturas que genere esta instancia.
+        self.styles = getSampleStyleSheet()
+        self.styles.add(ParagraphStyle(name='Center', alignment=1))
+
+    def tamano_pagina(self):
+        page_size_name = self.config.get_pdf_settings().get('page_size', 'letter')
+        return letter if page_size_name.lower() == 'letter' else A4
+
+    def generar_factura(self, factura, filename):
+        doc = SimpleDocTemplate(filename, pagesize=self.tamano_pagina())
+        doc.build(self.elementos_factura(factura))
+        return doc.page
+
+    def generar_facturas(self, facturas, filename):
+        doc = SimpleDocTemplate(filename, pagesize=self.tamano_pagina())
+        elements = []
+        for i, factura in enumerate(facturas):
+            if i:
+                elements.append(PageBreak())
+            elements.extend(self.elementos_factura(factura))
+        doc.build(elements)
+        return doc.page
+
+    def elementos_factura(self, factura):
+        styles = self.styles
+        elements = []
+
+        elements.append(Paragraph(f"Factura #{factura.numero}", styles['Title']))
+        elements.append(Paragraph(f"Fecha: {factura.fecha.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+        elements.append(Paragraph("Datos del Cliente:", styles['Heading2']))
+        elements.append(Paragraph(f"Nombre: {factura.cliente.nombre}", styles['Normal']))
+        elements.append(Paragraph(f"RFC: {factura.cliente.rfc}", styles['Normal']))
+        elements.append(Paragraph(f"Dirección: {factura.cliente.direccion}", styles['Normal']))
+        elements.append(Paragraph(f"Teléfono: {factura.cliente.telefono}", styles['Normal']))
+        elements.append(Paragraph(f"Email: {factura.cliente.email}", styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+        elements.append(Paragraph("Items:", styles['Heading2']))
+        data = [["Descripción", "Cantidad", "Precio Unitario", "Total"]]
+        for item in factura.items:
+            data.append([
+                item.producto.nombre,
+                str(item.cantidad),
+                f"${item.producto.precio:.2f}",
+                f"${item.total:.2f}"
+            ])
+        
+        table = Table(data)
+        table.setStyle(self.ESTILO_TABLA)
+        elements.append(table)
+        elements.append(Spacer(1, 12))
+
+        elements.append(Paragraph(f"Subtotal: ${factura.subtotal:.2f}", styles['Normal']))
+        elements.append(Paragraph(f"IVA (16%): ${factura.iva:.2f}", styles['Normal']))
+        elements.append(Paragraph(f"Total: ${factura.total:.2f}", styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+        elements.append(Paragraph(f"UUID: {factura.uuid}", styles['Normal']))
+
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(factura.uuid)
+        qr.make(fit=True)
+        qr_img = qr.make_image(fill_color="black", back_color="white")
+        
+        img_buffer = io.BytesIO()
+        qr_img.save(img_buffer, format='PNG')
+        img_buffer.seek(0)
+        qr_image = Image(img_buffer)
+        qr_image.drawHeight = 1.5*inch
+        qr_image.drawWidth = 1.5*inch
+        elements.append(qr_image)
+        return elements
+
+    def generar_reporte(self, facturas, filename):
+        doc = SimpleDocTemplate(filename, pagesize=landscape(letter))
+        elements = []
+        styles = self.styles
+
+        elements.append(Paragraph("Reporte de Ventas", styles['Title']))
+        elements.append(Spacer(1, 12))
+
+        data = [["Número de Factura", "Cliente", "Fecha", "Subtotal", "IVA", "Total"]]
+        for factura in facturas:
+            data.append([
+                str(factura.numero),
+                factura.cliente.nombre,
+                factura.fecha.strftime("%Y-%m-%d %H:%M:%S"),
+                f"${factura.subtotal:.2f}",
+                f"${factura.iva:.2f}",
+                f"${factura.total:.2f}"
+            ])
+
+        table = Table(data)
+        table.setStyle(self.ESTILO_TABLA)
+        elements.append(table)
+
+        total_ventas = sum(factura.total for factura in facturas)
+        elements.append(Spacer(1, 12))
+        elements.append(Paragraph(f"Total de Ventas: ${total_ventas:.2f}", styles['Heading2']))
+
+        doc.build(elements)
+
+class AlmacenPDF:
+    def __init__(self, generador, directorio="pdf_cache", max_bytes=200 * 1024 * 1024, max_memoria=32):
+        self.generador = generador
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.max_memoria = max_memoria
+        self.memoria = OrderedDict()
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        os.makedirs(self.directorio, exist_ok=True)
+        # Indice LRU del disco: clave -> tamaño, del menos al más recientemente usado.
+        self.disco = OrderedDict()
+        archivos = [e for e in os.scandir(self.directorio) if e.is_file() and e.name.endswith(".pdf")]
+        for entrada in sorted(archivos, key=lambda e: e.stat().st_mtime):
+            self.disco[entrada.name[:-4]] = entrada.stat().st_size
+        self.bytes_disco = sum(self.disco.values())
+
+    def clave(self, factura):
+        page_size = self.generador.config.get_pdf_settings().get('page_size', 'letter').lower()
+        return f"{factura.uuid}-{page_size}"
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.pdf")
+
+    def obtener(self, factura):
+        clave = self.clave(factura)
+        if clave in self.memoria:
+            self.memoria.move_to_end(clave)
+            self.aciertos_memoria += 1
+            return self.memoria[clave]
+
+        contenido = None
+        if clave in self.disco:
+            try:
+                with open(self.ruta(clave), "rb") as f:
+                    contenido = f.read()
+                os.utime(self.ruta(clave))
+                self.disco.move_to_end(clave)
+                self.aciertos_disco += 1
+            except OSError:
+                self.bytes_disco -= self.disco.pop(clave)
+
+        if contenido is None:
+            self.fallos += 1
+            buffer = io.BytesIO()
+            self.generador.generar_factura(factura, buffer)
+            contenido = buffer.getvalue()
+            self.guardar_en_disco(clave, contenido)
+
+        self.memoria[clave] = contenido
+        while len(self.memoria) > self.max_memoria:
+            self.memoria.popitem(last=False)
+        return contenido
+
+    def guardar_en_disco(self, clave, contenido):
+        ruta = self.ruta(clave)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+        self.disco[clave] = len(contenido)
+        self.bytes_disco += len(contenido)
+        while self.bytes_disco > self.max_bytes and len(self.disco) > 1:
+            antigua, tamano = self.disco.popitem(last=False)
+            self.bytes_disco -= tamano
+            try:
+                os.remove(self.ruta(antigua))
+            except FileNotFoundError:
+                pass
+
+    def guardar(self, factura, filename):
+        with open(filename, "wb") as f:
+            f.write(self.obtener(factura))
+
+    def tasa_aciertos(self):
+        consultas = self.aciertos_memoria + self.aciertos_disco + self.fallos
+        if consultas == 0:
+            return 0.0
+        return (self.aciertos_memoria + self.aciertos_disco) / consultas
+
+class GraficoVentas:
+    def __init__(self, master, max_barras=60):
+        self.max_barras = max_barras
+        self.ventas = {}
+        self.barras = None
+        # Se usa Figure directamente para que pyplot no retenga la figura en su registro.
+        self.figura = Figure(figsize=(10, 5))
+        self.ax = self.figura.add_subplot(111)
+        self.ax.set_xlabel('Fecha')
+        self.ax.set_ylabel('Ventas ($)')
+        self.canvas = FigureCanvasTkAgg(self.figura, master=master)
+        self.canvas.get_tk_widget().pack()
+
+    def cargar(self, ventas_por_dia):
+        self.ventas = {fecha: float(total) for fecha, total in ventas_por_dia.items()}
+        self.redibujar()
+
+    def agregar_venta(self, fecha, total):
+        self.ventas[fecha] = self.ventas.get(fecha, 0.0) + float(total)
+        self.redibujar()
+
+    def agrupar(self):
+        fechas = sorted(self.ventas)
+        ordinales = np.array([fecha.toordinal() for fecha in fechas])
+        valores = np.array([self.ventas[fecha] for fecha in fechas])
+        dias = int(ordinales[-1] - ordinales[0]) + 1
+        paso = -(-dias // self.max_barras)
+        alturas = np.bincount((ordinales - ordinales[0]) // paso, weights=valores)
+        inicios = [date.fromordinal(int(ordinales[0]) + i * paso) for i in range(len(alturas))]
+        return inicios, alturas, paso
+
+    def redibujar(self):
+        if not self.ventas:
+            return
+        inicios, alturas, paso = self.agrupar()
+
+        if self.barras is not None and len(self.barras) == len(alturas):
+            for barra, altura in zip(self.barras, alturas):
+                barra.set_height(altura)
+        else:
+            if self.barras is not None:
+                self.barras.remove()
+            self.barras = self.ax.bar(range(len(alturas)), alturas)
+
+        posiciones = list(range(0, len(alturas), max(1, len(alturas) // 12)))
+        self.ax.set_xticks(posiciones)
+        self.ax.set_xticklabels([inicios[i].strftime('%Y-%m-%d') for i in posiciones], rotation=45, ha='right')
+        self.ax.set_title('Ventas por Día' if paso == 1 else f'Ventas por periodos de {paso} días')
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.figura.tight_layout()
+        self.canvas.draw_idle()
+
+    def cerrar(self):
+        self.canvas.get_tk_widget().destroy()
+        self.figura.clear()
+        self.barras = None
+
+class Analitica:
+    RANGOS_ANTIGUEDAD = [0, 31, 61, 91, np.inf]
+    ETIQUETAS_ANTIGUEDAD = ["0-30 días", "31-60 días", "61-90 días", "Más de 90 días"]
+
+    def __init__(self, db):
+        self.db = db
+        self.cursor = db.conn.cursor()
+        self.version = None
+        self.cache = {}
+        # Bases creadas antes de existir los resúmenes, o cargadas por fuera de agregar_factura.
+        if self.db.resumenes_vacios():
+            self.db.reconstruir_resumenes()
+
+    def version_datos(self):
+        # data_version cambia con commits de otras conexiones; total_changes con los de la propia.
+        self.cursor.execute("PRAGMA data_version")
+        return self.cursor.fetchone()[0], self.db.conn.total_changes
+
+    def resumen(self, n=10, referencia=None):
+        version = self.version_datos()
+        if version != self.version:
+            self.cache = {}
+            self.version = version
+        clave = (n, referencia)
+        if clave not in self.cache:
+            clientes = self.estadisticas_clientes(referencia)
+            productos = self.top_productos(n)
+            self.cache[clave] = {
+                "top_clientes": self.top_clientes(clientes, n),
+                "antiguedad_clientes": self.antiguedad_clientes(clientes),
+                "top_productos": productos,
+                "unidades_por_mes": self.unidades_por_mes([p["id"] for p in productos]),
+                "crecimiento_mensual": self.crecimiento_mensual(),
+            }
+        return self.cache[clave]
+
+    def estadisticas_clientes(self, referencia=None):
+        referencia = referencia or datetime.now()
+        # Días naturales completos, para que los rangos 0-30, 31-60... no dependan de la hora de la compra.
+        self.cursor.execute('''
+            SELECT c.id, c.nombre, t.facturas, t.ventas, MAX(0, julianday(date(?)) - julianday(date(t.ultima)))
+            FROM (
+                SELECT cliente_id, SUM(facturas) AS facturas, SUM(subtotal) AS ventas, MAX(ultima) AS ultima
+                FROM resumen_clientes_mes
+                GROUP BY cliente_id
+            ) t
+            JOIN clientes c ON c.id = t.cliente_id
+        ''', (referencia.isoformat(sep=" "),))
+        filas = self.cursor.fetchall()
+        return {
+            "ids": np.array([fila[0] for fila in filas], dtype=np.int64),
+            "nombres": [fila[1] for fila in filas],
+            "facturas": np.array([fila[2] for fila in filas], dtype=np.int64),
+            "ventas": np.array([fila[3] for fila in filas], dtype=np.float64),
+            "dias_sin_compra": np.array([fila[4] for fila in filas], dtype=np.float64),
+        }
+
+    def top_clientes(self, clientes, n=10):
+        ventas = clientes["ventas"]
+        if ventas.size == 0:
+            return []
+        total = ventas.sum()
+        orden = np.argsort(-ventas, kind="stable")[:n]
+        return [{
+            "id": int(clientes["ids"][i]),
+            "nombre": clientes["nombres"][i],
+            "facturas": int(clientes["facturas"][i]),
+            "ventas": float(ventas[i]),
+            "participacion": float(ventas[i] / total) if total else 0.0,
+        } for i in orden]
+
+    def antiguedad_clientes(self, clientes):
+        conteos, _ = np.histogram(clientes["dias_sin_compra"], bins=self.RANGOS_ANTIGUEDAD)
+        return dict(zip(self.ETIQUETAS_ANTIGUEDAD, (int(c) for c in conteos)))
+
+    def top_productos(self, n=10):
+        self.cursor.execute('''
+            SELECT p.id, p.nombre, t.unidades, t.ventas, t.ventas / SUM(t.ventas) OVER ()
+            FROM (
+                SELECT producto_id, SUM(unidades) AS unidades, SUM(subtotal) AS ventas
+                FROM resumen_productos_mes
+                GROUP BY producto_id
+            ) t
+            JOIN productos p ON p.id = t.producto_id
+            ORDER BY t.ventas DESC
+            LIMIT ?
+        ''', (n,))
+        return [{
+            "id": fila[0],
+            "nombre": fila[1],
+            "unidades": fila[2],
+            "ventas": float(fila[3]),
+            "participacion": float(fila[4] or 0.0),
+        } for fila in self.cursor.fetchall()]
+
+    def unidades_por_mes(self, producto_ids):
+        if not producto_ids:
+            return {"meses": [], "productos": [], "unidades": np.zeros((0, 0), dtype=np.int64)}
+        marcadores = ", ".join("?" for _ in producto_ids)
+        self.cursor.execute(f'''
+            SELECT mes, producto_id, unidades
+            FROM resumen_productos_mes
+            WHERE producto_id IN ({marcadores})
+        ''', producto_ids)
+        filas = self.cursor.fetchall()
+        meses = sorted({fila[0] for fila in filas})
+        indice_mes = {mes: j for j, mes in enumerate(meses)}
+        indice_producto = {producto_id: i for i, producto_id in enumerate(producto_ids)}
+        unidades = np.zeros((len(producto_ids), len(meses)), dtype=np.int64)
+        for mes, producto_id, cantidad in filas:
+            unidades[indice_producto[producto_id], indice_mes[mes]] = cantidad
+        return {"meses": meses, "productos": list(producto_ids), "unidades": unidades}
+
+    def crecimiento_mensual(self):
+        # Los meses sin ventas se incluyen con 0 para que LAG compare siempre con el mes inmediato anterior.
+        self.cursor.execute('''
+            WITH RECURSIVE ventas_mes AS (
+                SELECT mes, SUM(subtotal) AS ventas
+                FROM resumen_clientes_mes
+                GROUP BY mes
+            ), meses (mes) AS (
+                SELECT * FROM (SELECT mes FROM ventas_mes ORDER BY mes LIMIT 1)
+                UNION ALL
+                SELECT strftime('%Y-%m', mes || '-01', '+1 month')
+                FROM meses
+                WHERE mes < (SELECT MAX(mes) FROM ventas_mes)
+            )
+            SELECT m.mes, COALESCE(v.ventas, 0), LAG(COALESCE(v.ventas, 0)) OVER (ORDER BY m.mes)
+            FROM meses m
+            LEFT JOIN ventas_mes v ON v.mes = m.mes
+            ORDER BY m.mes
+        ''')
+        filas = self.cursor.fetchall()
+        ventas = np.array([fila[1] for fila in filas], dtype=np.float64)
+        anteriores = np.array([np.nan if fila[2] is None else fila[2] for fila in filas], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crecimiento = (ventas - anteriores) / anteriores
+        return [{
+            "mes": fila[0],
+            "ventas": float(venta),
+            "crecimiento": None if not np.isfinite(c) else float(c),
+        } for fila, venta, c in zip(filas, ventas, crecimiento)]
+
+    def formatear(self, resumen):
+        # Todas las cantidades son ventas sin IVA, para que clientes y productos sean comparables.
+        lineas = ["Top clientes por ventas (sin IVA):"]
+        for i, cliente in enumerate(resumen["top_clientes"], 1):
+            lineas.append(f"  {i}. {cliente['nombre']} - {cliente['facturas']} facturas - "
+                          f"${cliente['ventas']:.2f} ({cliente['participacion']:.1%})")
+
+        lineas.append("")
+        lineas.append("Top productos por ventas (sin IVA):")
+        for i, producto in enumerate(resumen["top_productos"], 1):
+            lineas.append(f"  {i}. {producto['nombre']} - {producto['unidades']} unidades - "
+                          f"${producto['ventas']:.2f} ({producto['participacion']:.1%})")
+
+        unidades = resumen["unidades_por_mes"]
+        if unidades["meses"]:
+            ultimo = unidades["meses"][-1]
+            nombres = {p["id"]: p["nombre"] for p in resumen["top_productos"]}
+            lineas.append("")
+            lineas.append(f"Unidades vendidas en {ultimo}:")
+            for producto_id, fila in zip(unidades["productos"], unidades["unidades"]):
+                lineas.append(f"  {nombres.get(producto_id, producto_id)}: {int(fila[-1])}")
+
+        lineas.append("")
+        lineas.append("Crecimiento mensual (ventas sin IVA):")
+        for mes in resumen["crecimiento_mensual"][-12:]:
+            crecimiento = "-" if mes["crecimiento"] is None else f"{mes['crecimiento']:+.1%}"
+            lineas.append(f"  {mes['mes']}: ${mes['ventas']:.2f} ({crecimiento})")
+
+        lineas.append("")
+        lineas.append("Clientes por días desde su última compra:")
+        for rango, conteo in resumen["antiguedad_clientes"].items():
+            lineas.append(f"  {rango}: {conteo}")
+        return "\n".join(lineas)
+
+class VerificadorIntegridad:
+    TOLERANCIA = 0.01
+
+    def __init__(self, db, limite_ejemplos=10):
+        self.db = db
+        self.cursor = db.conn.cursor()
+        self.limite_ejemplos = limite_ejemplos
+
+    def comprobaciones(self):
+        return [
+            ("Items sin factura", '''
+                SELECT i.id, i.factura_numero
+                FROM items_factura i
+                LEFT JOIN facturas f ON f.numero = i.factura_numero
+                WHERE f.numero IS NULL
+            ''', ()),
+            ("Items con producto inexistente", '''
+                SELECT i.id, i.producto_id
+                FROM items_factura i
+                LEFT JOIN productos p ON p.id = i.producto_id
+                WHERE p.id IS NULL
+            ''', ()),
+            ("Facturas con cliente inexistente", '''
+                SELECT f.numero, f.cliente_id
+                FROM facturas f
+                LEFT JOIN clientes c ON c.id = f.cliente_id
+                WHERE c.id IS NULL
+            ''', ()),
+            ("Facturas sin items", '''
+                SELECT f.numero
+                FROM facturas f
+                WHERE f.numero NOT IN (SELECT factura_numero FROM items_factura WHERE factura_numero IS NOT NULL)
+            ''', ()),
+            ("Facturas con subtotal + IVA distinto del total", '''
+                SELECT numero, subtotal, iva, total
+                FROM facturas
+                WHERE ABS(subtotal + iva - total) > ?
+            ''', (self.TOLERANCIA,)),
+            ("Facturas cuyos items no suman el subtotal", '''
+                SELECT f.numero, f.subtotal, t.suma
+                FROM (
+                    SELECT factura_numero, SUM(total) AS suma
+                    FROM items_factura
+                    GROUP BY factura_numero
+                ) t
+                JOIN facturas f ON f.numero = t.factura_numero
+                WHERE ABS(f.subtotal - t.suma) > ?
+            ''', (self.TOLERANCIA,)),
+            ("UUID de factura duplicados", '''
+                SELECT uuid, COUNT(*)
+                FROM facturas
+                GROUP BY uuid
+                HAVING COUNT(*) > 1
+            ''', ()),
+            ("RFC de cliente duplicados", f'''
+                SELECT rfc, COUNT(*)
+                FROM clientes
+                WHERE {CONDICION_RFC_UNICO}
+                GROUP BY rfc
+                HAVING COUNT(*) > 1
+            ''', ()),
+        ]
+
+    def verificar(self):
+        resultado = {}
+        for nombre, sql, parametros in self.comprobaciones():
+            total = 0
+            ejemplos = []
+            # Se recorre el cursor fila por fila para no cargar en memoria todas las incidencias.
+            for fila in self.cursor.execute(sql, parametros):
+                total += 1
+                if len(ejemplos) < self.limite_ejemplos:
+                    ejemplos.append(fila)
+            resultado[nombre] = {"total": total, "ejemplos": ejemplos}
+        return resultado
+
+    def hay_problemas(self, resultado):
+        return bool(self.db.indices_faltantes) or any(r["total"] for r in resultado.values())
+
+    def formatear(self, resultado):
+        lineas = []
+        for nombre, r in resultado.items():
+            lineas.append(f"{nombre}: {r['total']}")
+            for ejemplo in r["ejemplos"]:
+                lineas.append("    " + ", ".join(str(valor) for valor in ejemplo))
+            if r["total"] > len(r["ejemplos"]):
+                lineas.append(f"    ... y {r['total'] - len(r['ejemplos'])} más")
+        for indice in self.db.indices_faltantes:
+            lineas.append(f"No se pudo crear el índice único {indice} por datos duplicados.")
+        return "\n".join(lineas)
+
+class Respaldo:
+    def __init__(self, db_path, directorio="respaldos", paginas_por_paso=1024, pausa=0.005, comprimir=False, conservar=7):
+        if conservar < 1:
+            # rotar() borraría también el respaldo recién creado.
+            raise ValueError(f"conservar debe ser al menos 1 (recibido: {conservar}).")
+        self.db_path = db_path
+        self.directorio = directorio
+        self.paginas_por_paso = paginas_por_paso
+        self.pausa = pausa
+        self.comprimir = comprimir
+        self.conservar = conservar
+        self.base = os.path.splitext(os.path.basename(db_path))[0]
+        self.patron = re.compile(rf"^{re.escape(self.base)}_\d{{8}}_\d{{6}}_\d{{3}}\.db(\.gz)?$")
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def crear(self):
+        marca = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        ruta = os.path.join(self.directorio, f"{self.base}_{marca}.db")
+        temporal = f"{ruta}.tmp"
+
+        # Conexión propia: la copia avanza por pasos y entre pasos las ventas pueden confirmarse.
+        origen = sqlite3.connect(self.db_path, timeout=30)
+        destino = sqlite3.connect(temporal)
+        try:
+            # En WAL, mantener abierta una transacción de lectura fija la instantánea que se copia:
+            # las ventas siguen confirmándose y la copia no se reinicia con cada escritura.
+            origen.execute("BEGIN")
+            origen.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            origen.backup(destino, pages=self.paginas_por_paso, sleep=self.pausa)
+            origen.rollback()
+            destino.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            destino.close()
+            origen.close()
+
+        if self.comprimir:
+            ruta += ".gz"
+            with open(temporal, "rb") as entrada, gzip.open(f"{ruta}.tmp", "wb", compresslevel=6) as salida:
+                shutil.copyfileobj(entrada, salida)
+            os.remove(temporal)
+            temporal = f"{ruta}.tmp"
+        os.replace(temporal, ruta)
+        self.rotar()
+        return ruta
+
+    def respaldos(self):
+        return sorted(nombre for nombre in os.listdir(self.directorio) if self.patron.match(nombre))
+
+    def rotar(self):
+        for nombre in self.respaldos()[:-self.conservar]:
+            os.remove(os.path.join(self.directorio, nombre))
+
+    def restaurar(self, ruta, destino):
+        with tempfile.TemporaryDirectory() as directorio:
+            origen_path = ruta
+            if ruta.endswith(".gz"):
+                origen_path = os.path.join(directorio, "respaldo.db")
+                with gzip.open(ruta, "rb") as entrada, open(origen_path, "wb") as salida:
+                    shutil.copyfileobj(entrada, salida)
+            origen = sqlite3.connect(origen_path)
+            destino_conn = sqlite3.connect(destino, timeout=30)
+            try:
+                origen.backup(destino_conn)
+            finally:
+                destino_conn.close()
+                origen.close()
+
+    def verificar(self, ruta):
+        with tempfile.TemporaryDirectory() as directorio:
+            restaurada = os.path.join(directorio, "restaurada.db")
+            self.restaurar(ruta, restaurada)
+            conn = sqlite3.connect(restaurada)
+            try:
+                integridad = conn.execute("PRAGMA integrity_check").fetchone()[0]
+                facturas = conn.execute("SELECT COUNT(*) FROM facturas").fetchone()[0]
+            finally:
+                conn.close()
+        return {"valido": integridad == "ok", "integridad": integridad, "facturas": facturas}
 
 class SistemaFacturacion:
     def __init__(self, root):
@@ -268,7 +1352,65 @@ class SistemaFacturacion:
         self.style.set_theme("arc")
         self.config = Config()
         self.db = Database()
+        self.sesion = uuid.uuid4().hex
+        self.items_factura = {}
+        self.db.liberar_reservas_vencidas()
+        atexit.register(self.db.liberar_reservas_sesion, self.sesion)
+        self.pdf = GeneradorPDF(self.config)
+        pdf_settings = self.config.get_pdf_settings()
+        self.almacen_pdf = AlmacenPDF(
+            self.pdf,
+            directorio=pdf_settings.get('cache_dir', 'pdf_cache'),
+            max_bytes=int(pdf_settings.get('cache_max_mb', '200')) * 1024 * 1024,
+            max_memoria=int(pdf_settings.get('cache_memoria', '32'))
+        )
         self.setup_ui()
+        self.setup_respaldo()
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar)
+
+    def cerrar(self):
+        # Libera la figura del gráfico antes de destruir la ventana que contiene su canvas.
+        if self.grafico is not None:
+            self.grafico.cerrar()
+            self.grafico = None
+        self.root.destroy()
+
+    def setup_respaldo(self):
+        respaldo_settings = self.config.get_respaldo_settings()
+        self.hilo_respaldo = None
+        try:
+            self.intervalo_respaldo = int(respaldo_settings.get('intervalo_minutos', '0'))
+            if self.intervalo_respaldo <= 0:
+                return
+            self.respaldo = Respaldo(
+                self.db.db_path,
+                directorio=respaldo_settings.get('directorio', 'respaldos'),
+                paginas_por_paso=int(respaldo_settings.get('paginas_por_paso', '1024')),
+                comprimir=respaldo_settings.get('comprimir', 'no').lower() in ('yes', 'true', '1'),
+                conservar=int(respaldo_settings.get('conservar', '7'))
+            )
+        except ValueError as e:
+            messagebox.showerror("Error", f"Configuración de respaldo inválida, respaldos automáticos desactivados: {e}")
+            return
+        self.root.after(self.intervalo_respaldo * 60 * 1000, self.ejecutar_respaldo)
+
+    def ejecutar_respaldo(self):
+        if self.hilo_respaldo is None or not self.hilo_respaldo.is_alive():
+            self.hilo_respaldo = threading.Thread(target=self.respaldo_en_segundo_plano, daemon=True)
+            self.hilo_respaldo.start()
+        self.root.after(self.intervalo_respaldo * 60 * 1000, self.ejecutar_respaldo)
+
+    def respaldo_en_segundo_plano(self):
+        try:
+            ruta = self.respaldo.crear()
+            verificacion = self.respaldo.verificar(ruta)
+        except (sqlite3.Error, OSError) as e:
+            mensaje = f"No se pudo crear el respaldo: {e}"
+            self.root.after(0, lambda: messagebox.showerror("Error", mensaje))
+            return
+        if not verificacion["valido"]:
+            mensaje = f"El respaldo {ruta} no pasó la verificación: {verificacion['integridad']}"
+            self.root.after(0, lambda: messagebox.showerror("Error", mensaje))
 
     def setup_ui(self):
         self.notebook = ttk.Notebook(self.root)
@@ -348,6 +1490,8 @@ class SistemaFacturacion:
         ttk.Button(frame, text="Ver Detalles", command=self.ver_detalles_factura).grid(row=1, column=0, pady=10)
         ttk.Button(frame, text="Imprimir Factura", command=self.imprimir_factura).grid(row=1, column=1, pady=10)
         ttk.Button(frame, text="Enviar por Correo", command=self.enviar_factura_correo).grid(row=1, column=2, pady=10)
+        ttk.Button(frame, text="Imprimir seleccionadas", command=self.imprimir_facturas_seleccionadas).grid(row=2, column=0, pady=10)
+        ttk.Button(frame, text="Imprimir por fechas", command=self.imprimir_facturas_por_fecha).grid(row=2, column=1, pady=10)
 
         self.actualizar_lista_facturas()
 
@@ -423,9 +1567,12 @@ class SistemaFacturacion:
 
         ttk.Button(frame, text="Generar Gráfico de Ventas", command=self.generar_grafico_ventas).grid(row=0, column=0, pady=10)
         ttk.Button(frame, text="Generar Reporte de Ventas", command=self.generar_reporte_ventas).grid(row=0, column=1, pady=10)
+        ttk.Button(frame, text="Ver Analítica", command=self.ver_analitica).grid(row=0, column=2, pady=10)
 
         self.grafico_frame = ttk.Frame(frame)
-        self.grafico_frame.grid(row=1, column=0, columnspan=2, pady=10)
+        self.grafico_frame.grid(row=1, column=0, columnspan=3, pady=10)
+        self.grafico = None
+        self.analitica = None
 
     def actualizar_lista_clientes(self):
         clientes = self.db.obtener_clientes()
@@ -471,19 +1618,24 @@ class SistemaFacturacion:
             messagebox.showerror("Error", "La cantidad debe ser un número entero.")
             return
 
-        productos = self.db.obtener_productos()
-        producto = next((p for p in productos if p.id == producto_id), None)
+        if cantidad <= 0:
+            messagebox.showerror("Error", "La cantidad debe ser mayor que cero.")
+            return
+
+        producto = self.db.obtener_producto(producto_id)
 
         if producto is None:
             messagebox.showerror("Error", "Producto no encontrado.")
             return
 
-        if cantidad > producto.stock:
-            messagebox.showerror("Error", f"Stock insuficiente. Stock actual: {producto.stock}")
+        reserva_id = self.db.reservar_stock(producto_id, cantidad, self.sesion)
+        if reserva_id is None:
+            messagebox.showerror("Error", f"Stock insuficiente. Stock actual: {self.db.stock_disponible(producto_id)}")
             return
 
-        total = Decimal(str(producto.precio)) * Decimal(str(cantidad))
-        self.items_tree.insert("", tk.END, values=(producto.nombre, cantidad, f"${producto.precio:.2f}", f"${total:.2f}"))
+        item = ItemFactura(producto, cantidad, reserva_id)
+        fila = self.items_tree.insert("", tk.END, values=(producto.nombre, cantidad, f"${producto.precio:.2f}", f"${item.total:.2f}"))
+        self.items_factura[fila] = item
 
         self.actualizar_totales()
 
@@ -506,12 +1658,7 @@ class SistemaFacturacion:
             messagebox.showerror("Error", "Por favor, seleccione un cliente.")
             return
 
-        items = []
-        for item in self.items_tree.get_children():
-            valores = self.items_tree.item(item)['values']
-            producto = next((p for p in self.db.obtener_productos() if p.nombre == valores[0]), None)
-            if producto:
-                items.append(ItemFactura(producto, int(valores[1])))
+        items = [self.items_factura[fila] for fila in self.items_tree.get_children()]
 
         if not items:
             messagebox.showerror("Error", "La factura debe tener al menos un item.")
@@ -529,14 +1676,20 @@ class SistemaFacturacion:
         total = subtotal + iva
 
         factura = Factura(None, cliente, items, subtotal, iva, total)
-        numero_factura = self.db.agregar_factura(factura)
-
-        for item in items:
-            self.db.actualizar_stock(item.producto.id, item.cantidad)
+        try:
+            numero_factura = self.db.agregar_factura(factura)
+        except StockInsuficienteError as e:
+            producto = next(item.producto for item in items if item.producto.id == e.producto_id)
+            messagebox.showerror("Error", f"Stock insuficiente para {producto.nombre}. Stock actual: {e.disponible}")
+            self.limpiar_campos_factura()
+            self.actualizar_lista_productos_tree()
+            return
 
         self.actualizar_lista_facturas()
         self.actualizar_lista_productos()
         self.actualizar_lista_productos_tree()
+        if self.grafico is not None:
+            self.grafico.agregar_venta(factura.fecha.date(), factura.total)
 
         messagebox.showinfo("Éxito", f"Factura #{numero_factura} generada correctamente.")
 
@@ -548,6 +1701,8 @@ class SistemaFacturacion:
         self.cantidad_entry.delete(0, tk.END)
         for item in self.items_tree.get_children():
             self.items_tree.delete(item)
+        self.items_factura.clear()
+        self.db.liberar_reservas_sesion(self.sesion)
         self.actualizar_totales()
 
     def ver_detalles_factura(self):
@@ -557,7 +1712,7 @@ class SistemaFacturacion:
             return
 
         numero_factura = self.facturas_tree.item(seleccion[0])['values'][0]
-        factura = next((f for f in self.db.obtener_facturas() if f.numero == numero_factura), None)
+        factura = self.db.obtener_factura(numero_factura)
 
         if factura:
             detalles = f"Factura #{factura.numero}\n\n"
@@ -586,7 +1741,7 @@ class SistemaFacturacion:
             return
 
         numero_factura = self.facturas_tree.item(seleccion[0])['values'][0]
-        factura = next((f for f in self.db.obtener_facturas() if f.numero == numero_factura), None)
+        factura = self.db.obtener_factura(numero_factura)
 
         if factura:
             filename = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
@@ -597,77 +1752,43 @@ class SistemaFacturacion:
             messagebox.showerror("Error", "No se encontró la factura seleccionada.")
 
     def generar_pdf(self, factura, filename):
-        # Get page size from config
-        page_size_name = self.config.get_pdf_settings().get('page_size', 'letter')
-        page_size = letter if page_size_name.lower() == 'letter' else A4
+        self.almacen_pdf.guardar(factura, filename)
 
-        doc = SimpleDocTemplate(filename, pagesize=page_size)
-        elements = []
-
-        styles = getSampleStyleSheet()
-        styles.add(Parag raphStyle(name='Center', alignment=1))
-
-        elements.append(Paragraph(f"Factura #{factura.numero}", styles['Title']))
-        elements.append(Paragraph(f"Fecha: {factura.fecha.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-        elements.append(Spacer(1, 12))
+    def imprimir_facturas_seleccionadas(self):
+        seleccion = self.facturas_tree.selection()
+        if not seleccion:
+            messagebox.showerror("Error", "Por favor, seleccione una o más facturas para imprimir.")
+            return
 
-        elements.append(Paragraph("Datos del Cliente:", styles['Heading2']))
-        elements.append(Paragraph(f"Nombre: {factura.cliente.nombre}", styles['Normal']))
-        elements.append(Paragraph(f"RFC: {factura.cliente.rfc}", styles['Normal']))
-        elements.append(Paragraph(f"Dirección: {factura.cliente.direccion}", styles['Normal']))
-        elements.append(Paragraph(f"Teléfono: {factura.cliente.telefono}", styles['Normal']))
-        elements.append(Paragraph(f"Email: {factura.cliente.email}", styles['Normal']))
-        elements.append(Spacer(1, 12))
+        numeros = [self.facturas_tree.item(fila)['values'][0] for fila in seleccion]
+        self.imprimir_lote(self.db.obtener_facturas_por_numero(numeros))
 
-        elements.append(Paragraph("Items:", styles['Heading2']))
-        data = [["Descripción", "Cantidad", "Precio Unitario", "Total"]]
-        for item in factura.items:
-            data.append([
-                item.producto.nombre,
-                str(item.cantidad),
-                f"${item.producto.precio:.2f}",
-                f"${item.total:.2f}"
-            ])
-        
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('ALIGN', (0, -1), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, -1), (-1, -1), 10),
-            ('TOPPADDING', (0, -1), (-1, -1), 12),
-        ]))
-        elements.append(table)
-        elements.append(Spacer(1, 12))
+    def imprimir_facturas_por_fecha(self):
+        desde_str = simpledialog.askstring("Imprimir por fechas", "Desde (AAAA-MM-DD):", parent=self.root)
+        if not desde_str:
+            return
+        hasta_str = simpledialog.askstring("Imprimir por fechas", "Hasta (AAAA-MM-DD):", initialvalue=desde_str, parent=self.root)
+        if not hasta_str:
+            return
 
-        elements.append(Paragraph(f"Subtotal: ${factura.subtotal:.2f}", styles['Normal']))
-        elements.append(Paragraph(f"IVA (16%): ${factura.iva:.2f}", styles['Normal']))
-        elements.append(Paragraph(f"Total: ${factura.total:.2f}", styles['Normal']))
-        elements.append(Spacer(1, 12))
+        try:
+            desde = date.fromisoformat(desde_str.strip())
+            hasta = date.fromisoformat(hasta_str.strip())
+        except ValueError:
+            messagebox.showerror("Error", "Las fechas deben tener el formato AAAA-MM-DD.")
+            return
 
-        elements.append(Paragraph(f"UUID: {factura.uuid}", styles['Normal']))
+        self.imprimir_lote(self.db.obtener_facturas_entre(desde, hasta))
 
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(factura.uuid)
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-        
-        img_buffer = io.BytesIO()
-        qr_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        qr_image = Image(img_buffer)
-        qr_image.drawHeight = 1.5*inch
-        qr_image.drawWidth = 1.5*inch
-        elements.append(qr_image)
+    def imprimir_lote(self, facturas):
+        if not facturas:
+            messagebox.showinfo("Información", "No hay facturas para imprimir.")
+            return
 
-        doc.build(elements)
+        filename = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
+        if filename:
+            paginas = self.pdf.generar_facturas(facturas, filename)
+            messagebox.showinfo("Éxito", f"{len(facturas)} facturas ({paginas} páginas) guardadas como {filename}")
 
     def enviar_factura_correo(self):
         seleccion = self.facturas_tree.selection()
@@ -676,11 +1797,10 @@ class SistemaFacturacion:
             return
 
         numero_factura = self.facturas_tree.item(seleccion[0])['values'][0]
-        factura = next((f for f in self.db.obtener_facturas() if f.numero == numero_factura), None)
+        factura = self.db.obtener_factura(numero_factura)
 
         if factura:
-            temp_pdf = f"factura_{factura.numero}.pdf"
-            self.generar_pdf(factura, temp_pdf)
+            nombre_pdf = f"factura_{factura.numero}.pdf"
             try:
                 # Get email settings from config
                 email_settings = self.config.get_email_settings()
@@ -701,9 +1821,8 @@ class SistemaFacturacion:
                 body = f"Estimado {factura.cliente.nombre},\n\nAdjunto encontrará la factura #{factura.numero}.\n\nGracias por su preferencia."
                 message.attach(MIMEText(body, "plain"))
 
-                with open(temp_pdf, "rb") as attachment:
-                    part = MIMEApplication(attachment.read(), Name=os.path.basename(temp_pdf))
-                part['Content-Disposition'] = f'attachment; filename="{os.path.basename(temp_pdf)}"'
+                part = MIMEApplication(self.almacen_pdf.obtener(factura), Name=nombre_pdf)
+                part['Content-Disposition'] = f'attachment; filename="{nombre_pdf}"'
                 message.attach(part)
 
                 with smtplib.SMTP(smtp_server, port) as server:
@@ -711,7 +1830,6 @@ class SistemaFacturacion:
                     server.login(sender_email, password)
                     server.send_message(message)
 
-                os.remove(temp_pdf)
                 messagebox.showinfo("Éxito", f"Factura enviada por correo a {factura.cliente.email}")
             except Exception as e:
                 messagebox.showerror("Error", f"No se pudo enviar el correo: {str(e)}")
@@ -730,7 +1848,11 @@ class SistemaFacturacion:
             return
 
         cliente = Cliente(None, nombre, direccion, telefono, email, rfc)
-        self.db.agregar_cliente(cliente)
+        try:
+            self.db.agregar_cliente(cliente)
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Error", f"Ya existe un cliente con el RFC {normalizar_rfc(rfc)}.")
+            return
         self.actualizar_lista_clientes()
         self.actualizar_lista_clientes_tree()
         self.limpiar_campos_cliente()
@@ -774,36 +1896,14 @@ class SistemaFacturacion:
         self.stock_producto_entry.delete(0, tk.END)
 
     def generar_grafico_ventas(self):
-        facturas = self.db.obtener_facturas()
-        if not facturas:
+        ventas_por_dia = self.db.ventas_por_dia()
+        if not ventas_por_dia:
             messagebox.showinfo("Información", "No hay datos de ventas para generar el gráfico.")
             return
 
-        ventas_por_dia = {}
-        for factura in facturas:
-            fecha = factura.fecha.date()
-            if fecha in ventas_por_dia:
-                ventas_por_dia[fecha] += factura.total
-            else:
-                ventas_por_dia[fecha] = factura.total
-
-        fechas = list(ventas_por_dia.keys())
-        ventas = list(ventas_por_dia.values())
-
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.bar(fechas, ventas)
-        ax.set_xlabel('Fecha')
-        ax.set_ylabel('Ventas ($)')
-        ax.set_title('Ventas por Día')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-
-        for widget in self.grafico_frame.winfo_children():
-            widget.destroy()
-
-        canvas = FigureCanvasTkAgg(fig, master=self.grafico_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack()
+        if self.grafico is None:
+            self.grafico = GraficoVentas(self.grafico_frame)
+        self.grafico.cargar(ventas_por_dia)
 
     def generar_reporte_ventas(self):
         facturas = self.db.obtener_facturas()
@@ -815,51 +1915,113 @@ class SistemaFacturacion:
         if not filename:
             return
 
-        doc = SimpleDocTemplate(filename, pagesize=landscape(letter))
-        elements = []
+        self.pdf.generar_reporte(facturas, filename)
+        messagebox.showinfo("Éxito", f"Reporte de ventas guardado como {filename}")
 
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(name='Center', alignment=1))
+    def ver_analitica(self):
+        if self.analitica is None:
+            self.analitica = Analitica(self.db)
+        resumen = self.analitica.resumen()
+        if not resumen["top_clientes"]:
+            messagebox.showinfo("Información", "No hay datos de ventas para generar la analítica.")
+            return
 
-        elements.append(Paragraph("Reporte de Ventas", styles['Title']))
-        elements.append(Spacer(1, 12))
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Analítica de Ventas")
+        texto = tk.Text(ventana, width=90, height=40)
+        texto.insert(tk.END, self.analitica.formatear(resumen))
+        texto.config(state=tk.DISABLED)
+        texto.pack(expand=True, fill="both")
 
-        data = [["Número de Factura", "Cliente", "Fecha", "Subtotal", "IVA", "Total"]]
-        for factura in facturas:
-            data.append([
-                str(factura.numero),
-                factura.cliente.nombre,
-                factura.fecha.strftime("%Y-%m-%d %H:%M:%S"),
-                f"${factura.subtotal:.2f}",
-                f"${factura.iva:.2f}",
-                f"${factura.total:.2f}"
-            ])
+def entero_positivo(valor):
+    numero = int(valor)
+    if numero < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1: {valor}")
+    return numero
 
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('ALIGN', (0, -1), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, -1), (-1, -1), 10),
-            ('TOPPADDING', (0, -1), (-1, -1), 12),
-        ]))
-        elements.append(table)
+def main():
+    parser = argparse.ArgumentParser(description="Sistema de Facturación")
+    subparsers = parser.add_subparsers(dest="comando")
 
-        total_ventas = sum(factura.total for factura in facturas)
-        elements.append(Spacer(1, 12))
-        elements.append(Paragraph(f"Total de Ventas: ${total_ventas:.2f}", styles['Heading2']))
+    archivar_parser = subparsers.add_parser("archivar", help="Mueve las facturas de un año cerrado a facturacion_AAAA.db")
+    archivar_parser.add_argument("anio", type=int)
+    archivar_parser.add_argument("--sin-compactar", action="store_true", help="No ejecutar VACUUM tras archivar")
 
-        doc.build(elements)
-        messagebox.showinfo("Éxito", f"Reporte de ventas guardado como {filename}")
+    analitica_parser = subparsers.add_parser("analitica", help="Muestra top de clientes y productos, crecimiento mensual y antigüedad")
+    analitica_parser.add_argument("--top", type=int, default=10)
+    analitica_parser.add_argument("--reconstruir", action="store_true", help="Recalcular los resúmenes mensuales desde las facturas")
+
+    verificar_parser = subparsers.add_parser("verificar", help="Revisa la integridad de la base de datos")
+    verificar_parser.add_argument("--ejemplos", type=int, default=10, help="Incidencias a mostrar por categoría")
+
+    importar_parser = subparsers.add_parser("importar-clientes", help="Importa clientes desde CSV, actualizando por RFC")
+    importar_parser.add_argument("archivo", help="CSV con columnas nombre, direccion, telefono, email, rfc")
+
+    respaldo_parser = subparsers.add_parser("respaldo", help="Crea un respaldo en línea de la base de datos")
+    respaldo_parser.add_argument("--directorio", default="respaldos")
+    respaldo_parser.add_argument("--comprimir", action="store_true")
+    respaldo_parser.add_argument("--conservar", type=entero_positivo, default=7)
+    respaldo_parser.add_argument("--paginas-por-paso", type=int, default=1024)
+
+    restaurar_parser = subparsers.add_parser("restaurar", help="Restaura un respaldo (con la aplicación cerrada)")
+    restaurar_parser.add_argument("archivo")
+    restaurar_parser.add_argument("--destino", default="facturacion.db")
+
+    args = parser.parse_args()
+
+    if args.comando == "archivar":
+        db = Database()
+        try:
+            archivadas = db.archivar_anio(args.anio, compactar=not args.sin_compactar)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"{archivadas} facturas de {args.anio} archivadas en {db.ruta_archivo(args.anio)}")
+        return
+
+    if args.comando == "analitica":
+        db = Database()
+        if args.reconstruir:
+            db.reconstruir_resumenes()
+        analitica = Analitica(db)
+        print(analitica.formatear(analitica.resumen(args.top)))
+        return
+
+    if args.comando == "verificar":
+        db = Database()
+        verificador = VerificadorIntegridad(db, args.ejemplos)
+        resultado = verificador.verificar()
+        print(verificador.formatear(resultado))
+        sys.exit(1 if verificador.hay_problemas(resultado) else 0)
+
+    if args.comando == "respaldo":
+        respaldo = Respaldo("facturacion.db", args.directorio, args.paginas_por_paso,
+                            comprimir=args.comprimir, conservar=args.conservar)
+        ruta = respaldo.crear()
+        verificacion = respaldo.verificar(ruta)
+        print(f"Respaldo {ruta}: {verificacion['facturas']} facturas, integridad {verificacion['integridad']}")
+        sys.exit(0 if verificacion["valido"] else 1)
+
+    if args.comando == "restaurar":
+        respaldo = Respaldo(args.destino, os.path.dirname(os.path.abspath(args.archivo)))
+        verificacion = respaldo.verificar(args.archivo)
+        if not verificacion["valido"]:
+            parser.error(f"El respaldo no pasó la verificación: {verificacion['integridad']}")
+        respaldo.restaurar(args.archivo, args.destino)
+        print(f"{args.archivo} restaurado en {args.destino} ({verificacion['facturas']} facturas)")
+        return
+
+    if args.comando == "importar-clientes":
+        db = Database()
+        if "idx_clientes_rfc" in db.indices_faltantes:
+            print("Aviso: hay RFC de cliente duplicados; cada fila actualiza el cliente más antiguo con su RFC. "
+                  "Ejecute `python facturacion.py verificar` para revisarlos.", file=sys.stderr)
+        importados = db.importar_clientes(args.archivo)
+        print(f"{importados} clientes importados")
+        return
 
-if __name__ == "__main__":
     root = tk.Tk()
     app = SistemaFacturacion(root)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()